@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+#
+# Script to download Sentinel-1 GRD products from Copernicus DataSpace service.
+#
+# Products are downloaded concurrently with asyncio + aiohttp: each product is
+# hundreds of MiB and the work is almost entirely network wait, so wall-clock
+# time drops roughly linearly with concurrency until the CDSE per-user
+# bandwidth cap is hit.
+#
+from datetime import date, timedelta
+import asyncio
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import base64
+import hashlib
+import json
+import os
+import sys
+import signal
+import argparse
+import threading
+import time
+
+from manifest import Manifest
+
+# Optional io_uring submission of chunk writes (--io-uring, Linux only,
+# needs the python-liburing bindings). Batching positioned writes through
+# the ring avoids a context switch per write when many range chunks land
+# concurrently on fast storage.
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+
+# One pooled session for all catalogue / identity traffic, with retry and
+# backoff on throttling (429) and transient server errors.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=5, backoff_factor=1,
+                      status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+
+#
+# Allow CTRL-C interrupt
+#
+def signal_handler(sig, frame):
+    sys.exit(0)
+signal.signal(signal.SIGINT, signal_handler)
+
+
+def get_keycloak(username: str, password: str) -> str:
+    data = {
+        "client_id": "cdse-public",
+        "username": username,
+        "password": password,
+        "grant_type": "password",
+    }
+    try:
+        r = SESSION.post(
+            "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token",
+            data=data,
+        )
+        r.raise_for_status()
+    except Exception as e:
+        raise Exception(
+            f"Keycloak token creation failed. Reponse from the server was: {r.json()}"
+        )
+    return r.json()["access_token"]
+
+
+class Token :
+    """
+    Keycloak access token that refreshes itself shortly before expiry
+    instead of being re-issued for every product. The expiry time is read
+    from the 'exp' claim of the JWT payload.
+    """
+
+    def __init__ (self, username, password) :
+        self.username = username
+        self.password = password
+        self.value = None
+        self.expires_at = 0.0
+        # get() runs on asyncio.to_thread workers; the lock keeps a refresh
+        # from being issued once per concurrent download.
+        self.lock = threading.Lock()
+
+    def get (self) :
+        with self.lock:
+            if self.value is None or time.time() > self.expires_at - 60 :
+                self.value = get_keycloak(self.username, self.password)
+                self.expires_at = self._jwt_expiry(self.value)
+            return self.value
+
+    def _jwt_expiry (self, token) :
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+        except Exception:
+            # Malformed/opaque token: assume the usual ~10 minute validity
+            return time.time() + 540
+
+
+def query_products (args) :
+    """
+    Query Copernicus Dataspace product database for Sentinel-1 GRD products.
+    Return result structure which can be used with download_products().
+
+    Parameters:
+
+    args (object) : arguments from argparse
+
+    """
+
+    #
+    # Calculate geographic area part of query based on bounding_box argument.
+    #
+    geographic_criteria = ""
+
+    if args.bounding_box :
+        geographic_criteria += f"and OData.CSC.Intersects(area=geography'SRID=4326;{args.bounding_box}') "
+
+    # OData API: https://documentation.dataspace.copernicus.eu/APIs/OData.html
+    # $select trims each record to the fields actually used downstream and
+    # $top=1000 is the server maximum page size; pages beyond the first are
+    # fetched by following @odata.nextLink so large date ranges are no longer
+    # silently truncated at 1000 products.
+    query_url = (f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products?"
+             f"$filter=Collection/Name eq 'SENTINEL-1' and contains(Name,'GRD') eq true "
+             f"{geographic_criteria}"
+             f"and ContentDate/Start gt {args.begin_date}T00:00:00.000Z "
+             f"and ContentDate/Start lt {args.end_date}T00:00:00.000Z "
+             f"&$count=True&$top=1000"
+             f"&$select=Id,Name,ContentLength" )
+
+    if args.debug :
+        print (f"query_url={query_url}")
+
+    # The response is deterministic for a fixed query, so cache it on disk
+    # keyed by a hash of the URL: repeat runs during iterative development
+    # skip the catalogue round trip until the cache entry ages out.
+    cache_path = None
+    if args.grd_root :
+        key = hashlib.sha256(query_url.encode()).hexdigest()
+        cache_path = f"{args.grd_root}/.query_cache/{key}.json"
+        if (not args.refresh_query and os.path.exists(cache_path)
+                and time.time() - os.path.getmtime(cache_path) < args.query_ttl) :
+            with open(cache_path) as f:
+                rows = json.load(f)
+            print(f" total GRD products found {len(rows)} (cached)")
+            return rows
+
+    json_ = SESSION.get(query_url).json()
+    rows = json_["value"]
+    while json_.get("@odata.nextLink") :
+        json_ = SESSION.get(json_["@odata.nextLink"]).json()
+        rows.extend(json_["value"])
+
+    if args.debug :
+        print (f"rows={len(rows)}")
+
+    if cache_path :
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(rows, f)
+
+    print(f" total GRD products found {len(rows)}")
+
+    # Downstream code only reads scalar properties (Id, Name,
+    # ContentLength), so keep the plain list of dicts: no per-row Shapely
+    # geometry parsing, no GeoDataFrame.
+    return rows
+
+
+def list_products (products, args) :
+
+    # One scandir of the GRD root instead of a stat() per product
+    existing = {e.name for e in os.scandir(args.grd_root)} if os.path.isdir(args.grd_root) else set()
+
+    for feat in products:
+        product_name = feat['Name']
+        size_MiB = feat['ContentLength'] / (1024*1024)
+        safe_file = os.path.basename(get_safe_file_path(product_name,args))
+
+        downloaded_checkmark = "x"
+        if safe_file in existing :
+            downloaded_checkmark = "✔"
+
+        print (f"{product_name} {size_MiB:5.0f} {downloaded_checkmark}")
+
+
+def get_safe_file_path (product_name, args) :
+    if product_name.endswith(".SAFE") :
+        safe_file = f"{product_name}.zip"
+    else :
+        safe_file = f"{product_name}.SAFE.zip"
+
+    return f"{args.grd_root}/{safe_file}"
+
+
+class PwriteWriter :
+    """
+    Positioned chunk writes via plain os.pwrite. Portable default.
+    """
+
+    def __init__ (self, fd) :
+        self.fd = fd
+
+    def write (self, data, offset) :
+        os.pwrite(self.fd, data, offset)
+
+    def close (self) :
+        pass
+
+
+class UringWriter :
+    """
+    Positioned chunk writes submitted as IORING_OP_WRITE SQEs on an
+    io_uring, reaping completions lazily so up to queue_depth writes are
+    batched per submit syscall.
+    """
+
+    def __init__ (self, fd, queue_depth=32) :
+        self.queue_depth = queue_depth
+        self.ring = liburing.io_uring()
+        liburing.io_uring_queue_init(queue_depth, self.ring, 0)
+        self.fd = fd
+        self.cqe = liburing.io_uring_cqe()
+        self.inflight = {}  # user_data -> (buffer keep-alive, file offset)
+        self.seq = 0
+        self.unsubmitted = 0
+
+    def _prep (self, buf, offset) :
+        sqe = liburing.io_uring_get_sqe(self.ring)
+        liburing.io_uring_prep_write(sqe, self.fd, buf, len(buf), offset)
+        self.seq += 1
+        sqe.user_data = self.seq
+        self.inflight[self.seq] = (buf, offset)
+        self.unsubmitted += 1
+
+    def write (self, data, offset) :
+        while len(self.inflight) >= self.queue_depth :
+            self._reap()
+        self._prep(bytearray(data), offset)
+
+    def _reap (self) :
+        # Flush everything queued since the last reap in one submit
+        # syscall, then wait for a single completion; SQEs are not
+        # submitted one-by-one in write().
+        if self.unsubmitted :
+            liburing.io_uring_submit(self.ring)
+            self.unsubmitted = 0
+        liburing.io_uring_wait_cqe(self.ring, self.cqe)
+        res = self.cqe.res
+        buf, offset = self.inflight.pop(self.cqe.user_data)
+        liburing.io_uring_cqe_seen(self.ring, self.cqe)
+        if res < 0 :
+            raise OSError(-res, os.strerror(-res))
+        if res < len(buf) :
+            # Short write: resubmit the remainder at the advanced offset
+            # rather than leaving a hole in the fallocated file.
+            self._prep(buf[res:], offset + res)
+
+    def close (self) :
+        while self.inflight :
+            self._reap()
+        liburing.io_uring_queue_exit(self.ring)
+
+
+def make_chunk_writer (fd, args) :
+    if args.io_uring and liburing is not None and sys.platform == "linux" :
+        # Ring setup can still fail (binding API drift, kernel without
+        # io_uring, RLIMIT_MEMLOCK); degrade to pwrite rather than failing
+        # every chunked download.
+        try:
+            return UringWriter(fd)
+        except Exception as e:
+            print(f"io_uring setup failed ({e}), falling back to pwrite")
+    elif args.io_uring :
+        print("io_uring not available, falling back to pwrite")
+    return PwriteWriter(fd)
+
+
+async def download_range (session, headers, url, writer, start, end) :
+    """
+    Download bytes [start,end] of url and write them at the matching offset
+    of the output file with positioned writes.
+    """
+    range_headers = dict(headers)
+    range_headers["Range"] = f"bytes={start}-{end}"
+    async with session.get(url, headers=range_headers) as response:
+        if response.status != 206 :
+            raise Exception(f"expected 206 partial content for range {start}-{end}, got {response.status}")
+        offset = start
+        async for chunk in response.content.iter_chunked(1 << 20):
+            writer.write(chunk, offset)
+            offset += len(chunk)
+
+
+async def download_chunked (session, headers, url, safe_download_path, content_length, args) :
+    """
+    Download url in n_chunks parallel HTTP Range requests written directly to
+    their offsets in safe_download_path. A single TCP stream is typically
+    throttled per-connection by CDSE, so several ranges in flight saturate the
+    link, and streaming chunk-by-chunk keeps memory at O(chunk) rather than
+    O(file). Raises (and removes the partial file) on failure, so the
+    single-stream fallback never tries to resume from a fallocated hole.
+    """
+    fd = os.open(safe_download_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        os.posix_fallocate(fd, 0, content_length)
+        writer = make_chunk_writer(fd, args)
+        try:
+            chunk_size = -(-content_length // args.range_chunks)  # ceil division
+            async with asyncio.TaskGroup() as tg:
+                for start in range(0, content_length, chunk_size):
+                    end = min(start + chunk_size, content_length) - 1
+                    tg.create_task(download_range(session, headers, url, writer, start, end))
+        finally:
+            writer.close()
+        os.fsync(fd)
+    except Exception:
+        os.close(fd)
+        os.remove(safe_download_path)
+        raise
+    os.close(fd)
+
+    if os.path.getsize(safe_download_path) != content_length :
+        os.remove(safe_download_path)
+        raise Exception("chunked download size does not match Content-Length")
+
+
+async def download_one_product (session, sem, token, manifest, product_id, safe_download_path, safe_path, args) :
+    """
+    Download one GRD product. Entry is gated by the semaphore so that at most
+    args.parallel downloads are in flight at any time.
+
+    session (aiohttp.ClientSession) : shared session, created once in download_products()
+
+    sem (asyncio.Semaphore) : bounds the number of concurrent downloads
+
+    token (Token) : shared access token, refreshed only when close to expiry
+
+    product_id (string) : Product ID. Example 'S1A_IW_GRDH_1SDV_20241105T062124_...'
+
+    safe_download_path (string) : A temporary file path into which to start the download. When complete it will be moved to safe_path.
+
+    safe_path (string) : The final destination of the fully downloaded product file.
+    """
+
+    async with sem:
+        try:
+            # The token refresh is a blocking requests POST; keep it off
+            # the event loop like the other blocking work here.
+            headers = {"Authorization": f"Bearer {await asyncio.to_thread(token.get)}"}
+            url = f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products({product_id})/$value"
+
+            print(f"getting {url}")
+
+            # One HEAD with redirects followed natively resolves the final
+            # download URL and its size in a single round trip; no manual
+            # 301/302 walk.
+            response = await session.head(url, headers=headers, allow_redirects=True)
+            response.close()
+            url = str(response.url)
+            content_length = int(response.headers.get("Content-Length", 0))
+            ranges_ok = response.headers.get("Accept-Ranges") == "bytes"
+
+            print(f"{product_id} writing to {safe_download_path}")
+            try:
+                if content_length == 0 or not ranges_ok :
+                    raise Exception("server does not advertise byte-range support")
+                await download_chunked(session, headers, url, safe_download_path, content_length, args)
+            except Exception as e:
+                # Server would not serve byte ranges, download in one stream,
+                # writing chunks to disk as they arrive rather than buffering
+                # the whole SAFE.zip in memory. Resume from any partial file
+                # left by an earlier interrupted attempt.
+                print(f"{product_id} range download failed ({e}), falling back to single stream")
+                resume_from = os.path.getsize(safe_download_path) if os.path.exists(safe_download_path) else 0
+                stream_headers = dict(headers)
+                if resume_from > 0 :
+                    stream_headers["Range"] = f"bytes={resume_from}-"
+                async with session.get(url, headers=stream_headers) as response:
+                    response.raise_for_status()
+                    if response.status != 206 :
+                        resume_from = 0  # server ignored the Range, restart from byte 0
+                    with open(safe_download_path, "ab" if resume_from > 0 else "wb") as p:
+                        async for chunk in response.content.iter_chunked(1 << 20):
+                            p.write(chunk)
+
+            # The assembled file must match the advertised length before it
+            # becomes visible under its final name.
+            if content_length > 0 and os.path.getsize(safe_download_path) != content_length :
+                raise Exception(f"downloaded size {os.path.getsize(safe_download_path)} "
+                                f"does not match Content-Length {content_length}")
+
+            # Check if good SAFE.zip file, use file length for the moment.
+            safe_file_size = os.path.getsize(safe_download_path)
+            if safe_file_size > 100000 :
+                print(f"{product_id} renaming from {safe_download_path} to {safe_path}")
+                # Now that we've got a good product downloaded, rename to final filename
+                os.rename(safe_download_path, safe_path)
+                # Hashing the multi-hundred-MiB product is blocking CPU+disk
+                # work; run it on a worker thread so the other downloads in
+                # flight keep streaming.
+                await asyncio.to_thread(manifest.record, product_id, safe_path)
+                print(f"{product_id} has been downloaded")
+            else :
+                print(f"{safe_download_path} too small to be a valid SAFE.zip size={safe_file_size}")
+
+        except Exception as e:
+            print(f"problem with server: {e}")
+
+
+async def download_products (products, args) :
+
+    allfeat = len(products)
+
+    if allfeat == 0:
+        print("No products found.")
+        return
+
+    # One token and one session shared by every download; the connector caps
+    # the connection pool while the semaphore caps downloads in flight.
+    token = Token(args.username, args.password)
+    manifest = Manifest(args.grd_root)
+    sem = asyncio.Semaphore(args.parallel)
+    connector = aiohttp.TCPConnector(limit=8)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with asyncio.TaskGroup() as tg:
+            for feat in products:
+
+                product_uuid = feat['Id']
+                product_name = feat['Name']
+
+                safe_path = get_safe_file_path(product_name, args)
+                safe_file = os.path.basename(safe_path)
+                safe_download_path = f"{args.grd_root}/_downloading_{safe_file}"
+
+                # If the product is already downloaded and matches the
+                # manifest, skip without re-reading the file. On a stat
+                # mismatch this re-hashes the file, so keep it off the loop.
+                if await asyncio.to_thread(manifest.is_downloaded, product_uuid, safe_path) :
+                    print (f"Product {safe_path} already downloaded")
+                    continue
+
+                print(f"Downloading product_name={product_name} product_id={product_uuid} into {safe_path}")
+
+                tg.create_task(download_one_product(session, sem, token, manifest, product_uuid, safe_download_path, safe_path, args))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Download Sentinel-1 GRD products.")
+
+    parser.add_argument("--begin-date",help="The begin date (yyyy-MM-dd) for the search.", required=True)
+    parser.add_argument("--end-date",  help="The end date (yyyy-MM-dd) for the search.")
+    parser.add_argument("--bounding-box", help="Lat/lng based bounding box of the area of interest. Example: 'POLYGON((2.51 49.52, 6.15 49.52, 6.15 51.48, 2.51 51.48, 2.51 49.52))'")
+    parser.add_argument("--grd-root",  help="The root of the GRD directory into which to write the GRD SAFE.zip files.", required=True)
+    parser.add_argument("--username",  help="Dataspace username / email address.")
+    parser.add_argument("--password",  help="Password associated with username.")
+    parser.add_argument("--parallel",  type=int, default=4, help="Number of concurrent product downloads.")
+    parser.add_argument("--range-chunks", type=int, default=4, help="Number of parallel HTTP Range requests used per product download.")
+    parser.add_argument("--io-uring", action="store_true", help="Submit chunk writes through io_uring (Linux, requires python-liburing).")
+    parser.add_argument("--query-ttl", type=int, default=3600, help="Seconds for which a cached catalogue query response is reused.")
+    parser.add_argument("--refresh-query", action="store_true", help="Bypass the on-disk query cache and re-issue the catalogue query.")
+    parser.add_argument("--query-only", action="store_true", help="Only issue the product query and determine which products require downloading. No product downloads will take place.")
+    parser.add_argument("--debug", action="store_true", help="Output debugging information.")
+    args = parser.parse_args()
+
+    products = query_products (args)
+
+    if len(products) == 0 :
+        print ("No products found that match query.")
+        exit(0)
+
+    if args.query_only == True :
+        list_products (products, args)
+    else :
+        asyncio.run(download_products (products, args))
@@ -0,0 +1,72 @@
+#
+# Persistent manifest of known-good downloaded products.
+#
+# Keyed by product UUID, storing (size, mtime, sha256) so that repeat runs
+# can trust a file on a cheap stat() match and only pay the sha256 re-hash
+# when size or mtime disagree with the recorded row.
+#
+import hashlib
+import os
+import sqlite3
+
+
+class Manifest :
+
+    def __init__ (self, root_dir) :
+        # Callers may run manifest methods on asyncio.to_thread workers, so
+        # the connection must be usable off its creating thread; sqlite3 in
+        # CPython serializes access to a shared connection itself.
+        self.db = sqlite3.connect(f"{root_dir}/.manifest.sqlite",
+                                  check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            "uuid TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT)"
+        )
+        self.db.commit()
+
+    def sha256_of_file (self, path) :
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    def is_downloaded (self, uuid, path) :
+        """
+        Return True if path exists and matches the manifest row for uuid.
+        Size+mtime agreement is trusted without re-reading the file; on a
+        mismatch the sha256 is recomputed and compared.
+        """
+        if not os.path.exists(path) :
+            return False
+
+        row = self.db.execute(
+            "SELECT size, mtime, sha256 FROM products WHERE uuid = ?", (uuid,)
+        ).fetchone()
+        if row is None :
+            return False
+
+        size, mtime, sha256 = row
+        st = os.stat(path)
+        if st.st_size == size and st.st_mtime == mtime :
+            return True
+
+        # stat mismatch: re-hash before trusting the file
+        if self.sha256_of_file(path) == sha256 :
+            self.record(uuid, path, sha256=sha256)
+            return True
+
+        return False
+
+    def record (self, uuid, path, sha256=None) :
+        """
+        Record a freshly downloaded (or re-verified) product file.
+        """
+        if sha256 is None :
+            sha256 = self.sha256_of_file(path)
+        st = os.stat(path)
+        self.db.execute(
+            "INSERT OR REPLACE INTO products (uuid, size, mtime, sha256) VALUES (?,?,?,?)",
+            (uuid, st.st_size, st.st_mtime, sha256),
+        )
+        self.db.commit()
+
+    def close (self) :
+        self.db.close()
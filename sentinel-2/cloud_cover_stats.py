@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+#
+# Compute a simple brightness / NDVI / whiteness cloud mask over Sentinel-2
+# L2A band stacks (GeoTIFF with B02,B03,B04,B08) and report per-file valid
+# and cloud pixel counts as CSV rows.
+#
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, fields
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+import rasterio
+
+# numexpr fuses the whole cloud test into one pass over the bands; the
+# kernel is memory-bandwidth-bound, so avoiding the ~10 full-size float32
+# temporaries of the plain NumPy version is worth 3-5x on a full tile.
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+# A numba kernel goes one better than numexpr: a single tight loop that LLVM
+# auto-vectorizes, with per-pixel scalar temporaries living in registers and
+# prange for multi-core. cache=True persists the compiled kernel so the JIT
+# cost is not paid per run.
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+@dataclass
+class Thresholds:
+    t_bright: float = 0.22   # visible-mean reflectance above which a pixel can be cloud
+    t_ndvi: float = 0.20     # NDVI must be below this (vegetation is not cloud)
+    t_white: float = 0.70    # visible-band spread relative to the mean (clouds are white)
+    haze_blue: float = 1.12  # blue vs mean(green,red) ratio flagging haze
+
+
+def read_band (ds, band_index_1based, window=None) :
+    """
+    Read one band (optionally one window of it) in its native dtype (uint16
+    DN for Sentinel-2), returning (array, bool validity mask). No float
+    promotion: the cloud test runs in integer arithmetic, halving memory
+    traffic versus float32. The validity mask is a direct nodata comparison
+    rather than rasterio's masked-array path, which allocates a MaskedArray
+    plus a second full copy from .filled().
+    """
+    arr = ds.read(band_index_1based, window=window)
+    nd = ds.nodata
+    valid = np.ones(arr.shape, np.bool_) if nd is None else (arr != nd)
+    return arr, valid
+
+
+def infer_scale_factor (arr, step=16) :
+    """
+    Guess whether the band holds raw DN (0..10000) or already-scaled
+    reflectance, from a strided sample of the array.
+    """
+    sample = arr[::step, ::step]
+    if np.issubdtype(arr.dtype, np.integer) :
+        # Integer DN is finite by construction: no isfinite mask, and an
+        # O(n) partition for the 99th percentile instead of a full sort.
+        if sample.size == 0 :
+            return 1.0
+        sample = sample.ravel()
+        k = min(int(0.99 * sample.size), sample.size - 1)
+        p99 = np.partition(sample, k)[k]
+    else :
+        sample = sample[np.isfinite(sample)]
+        if sample.size == 0 :
+            return 1.0
+        p99 = np.percentile(sample, 99)
+    return 1.0 / 10000.0 if p99 > 2.0 else 1.0
+
+
+if njit is not None :
+
+    @njit(parallel=True, fastmath=True, boundscheck=False, cache=True)
+    def cloud_kernel (b2, b3, b4, b8, valid, valid_bits, cloud_bits, tb3, tn_i, tw_i, hb) :
+        # Writes one bit per pixel into uint8 bitmaps of shape (H, W//8+):
+        # the reductions then run as popcounts over 8x fewer bytes. Each
+        # row's bytes are owned by a single prange iteration, so the packed
+        # writes are race-free.
+        for i in prange(b2.shape[0]):
+            for jb in range(valid_bits.shape[1]):
+                vbyte = np.uint8(0)
+                cbyte = np.uint8(0)
+                j0 = jb * 8
+                jmax = min(j0 + 8, b2.shape[1])
+                for j in range(j0, jmax):
+                    if not valid[i, j] :
+                        continue
+                    bit = np.uint8(1 << (j - j0))
+                    vbyte |= bit
+                    p2 = np.int32(b2[i, j])
+                    p3 = np.int32(b3[i, j])
+                    p4 = np.int32(b4[i, j])
+                    p8 = np.int32(b8[i, j])
+                    vis3 = p2 + p3 + p4
+                    if vis3 <= tb3 :
+                        continue
+                    ndvi_ok = (p8 - p4) * 10000 < tn_i * (p8 + p4)
+                    w3 = abs(3 * p2 - vis3) + abs(3 * p3 - vis3) + abs(3 * p4 - vis3)
+                    white_ok = w3 * 1000 < tw_i * vis3
+                    haze = 2.0 * p2 > hb * (p3 + p4)
+                    if (ndvi_ok and white_ok) or haze :
+                        cbyte |= bit
+                valid_bits[i, jb] = vbyte
+                cloud_bits[i, jb] = cbyte
+
+
+# uint8 popcount lookup for NumPy < 2.0 (np.bitwise_count is 2.0+)
+POPCOUNT8 = np.array([bin(v).count("1") for v in range(256)], dtype=np.uint32)
+
+
+def popcount (bits) :
+    if hasattr(np, "bitwise_count") :
+        return int(np.bitwise_count(bits).sum())
+    return int(POPCOUNT8[bits].sum())
+
+
+def compute_cloud_mask (b2, b3, b4, b8, valid, tb_dn, tn_i, tw_i, haze_blue) :
+    """
+    Cloud test: bright AND not vegetated AND spectrally flat (white), or
+    bright with a raised blue ratio (haze). Returns a bool mask limited to
+    valid pixels.
+
+    Runs on uint16 DN with int32 intermediates; the NDVI and whiteness ratio
+    tests are cross-multiplied against the pre-scaled integer thresholds
+    (tn_i = t_ndvi x 10000, tw_i = t_white x 1000, tb_dn = t_bright in DN)
+    so all comparisons stay exact and SIMD-friendly. The haze ratio test is
+    likewise cross-multiplied (a/b > c becomes a > c*b for b >= 0), so no
+    divisions and no eps guards remain.
+    """
+    b2i = b2.astype(np.int32)
+    b3i = b3.astype(np.int32)
+    b4i = b4.astype(np.int32)
+    b8i = b8.astype(np.int32)
+    vis3 = b2i + b3i + b4i  # 3 x visible mean
+    tb3 = 3 * tb_dn
+
+    if numexpr is not None :
+        # Single fused pass: the four bands stream through cache once.
+        return numexpr.evaluate(
+            "((vis3 > tb3)"
+            " & (((b8i - b4i) * 10000) < (tn_i * (b8i + b4i)))"
+            " & (((abs(3*b2i - vis3) + abs(3*b3i - vis3) + abs(3*b4i - vis3)) * 1000) < (tw_i * vis3))"
+            " | ((vis3 > tb3) & ((2.0 * b2i) > (hb * (b3i + b4i)))))"
+            " & valid",
+            local_dict={
+                "b2i": b2i, "b3i": b3i, "b4i": b4i, "b8i": b8i,
+                "vis3": vis3, "valid": valid,
+                "tb3": tb3, "tn_i": tn_i, "tw_i": tw_i, "hb": haze_blue,
+            },
+        )
+
+    whiteness3 = (np.abs(3 * b2i - vis3)
+                  + np.abs(3 * b3i - vis3)
+                  + np.abs(3 * b4i - vis3))
+
+    bright = vis3 > tb3
+    cloud = bright \
+        & ((b8i - b4i) * 10000 < tn_i * (b8i + b4i)) \
+        & (whiteness3 * 1000 < tw_i * vis3)
+    cloud |= bright & (2.0 * b2i > haze_blue * (b3i + b4i))
+    return cloud & valid
+
+
+def process_file (path, th, gdal_threads="ALL_CPUS") :
+    """
+    Compute cloud statistics for one GeoTIFF. Returns a CSV row dict, or
+    None if the file has no valid pixels. gdal_threads is the GDAL decoder
+    thread budget for this worker (see main()).
+    """
+    valid_px = 0
+    cloud_px = 0
+    tb_dn = None
+    dn_factor = None
+
+    # Iterate the GeoTIFF's own internal blocks rather than materializing
+    # full 10980^2 bands: the per-file working set drops to one block per
+    # band and the kernel runs hot in cache. The GDAL env raises the block
+    # cache well above the 40 MB default and lets LZW/DEFLATE/ZSTD codecs
+    # decompress multithreaded inside GDAL; it is entered here (not in
+    # main) so the settings apply inside each worker process.
+    with rasterio.Env(GDAL_CACHEMAX=1024,
+                      GDAL_NUM_THREADS=gdal_threads,
+                      GDAL_TIFF_INTERNAL_MASK='YES',
+                      CPL_VSIL_CURL_ALLOWED_EXTENSIONS='.tif'), \
+         rasterio.open(path) as ds:
+        for _, window in ds.block_windows(1):
+            b2, v2 = read_band(ds, 1, window)
+            b3, v3 = read_band(ds, 2, window)
+            b4, v4 = read_band(ds, 3, window)
+            b8, v8 = read_band(ds, 4, window)
+
+            valid = v2 & v3 & v4 & v8
+
+            # Express the reflectance thresholds in integer DN units; the
+            # scale is inferred from the first block only and reused.
+            if tb_dn is None :
+                scale = infer_scale_factor(b2, step=4)
+                if np.issubdtype(b2.dtype, np.integer) :
+                    tb_dn = int(round(th.t_bright / scale))
+                else :
+                    # Float bands (already-scaled reflectance, or DN stored
+                    # as float) are rescaled to integer DN per block below:
+                    # casting [0,1] reflectance straight to int32 would
+                    # truncate every pixel to 0.
+                    dn_factor = scale * 10000.0
+                    tb_dn = int(round(th.t_bright * 10000))
+                tn_i = int(round(th.t_ndvi * 10000))
+                tw_i = int(round(th.t_white * 1000))
+
+            if dn_factor is not None :
+                b2 = np.rint(b2 * dn_factor).astype(np.int32)
+                b3 = np.rint(b3 * dn_factor).astype(np.int32)
+                b4 = np.rint(b4 * dn_factor).astype(np.int32)
+                b8 = np.rint(b8 * dn_factor).astype(np.int32)
+
+            if njit is not None :
+                h, w = b2.shape
+                valid_bits = np.empty((h, (w + 7) // 8), np.uint8)
+                cloud_bits = np.empty_like(valid_bits)
+                cloud_kernel(b2, b3, b4, b8, valid, valid_bits, cloud_bits,
+                             3 * tb_dn, tn_i, tw_i, th.haze_blue)
+                valid_px += popcount(valid_bits)
+                cloud_px += popcount(cloud_bits)
+            else :
+                cloud = compute_cloud_mask(b2, b3, b4, b8, valid, tb_dn, tn_i, tw_i, th.haze_blue)
+                valid_px += int(np.count_nonzero(valid))
+                cloud_px += int(np.count_nonzero(cloud))
+
+    if valid_px == 0 :
+        return None
+
+    row = {
+        "file": os.path.basename(path),
+        "valid_px": valid_px,
+        "cloud_px": cloud_px,
+        "cloud_fraction": cloud_px / valid_px,
+    }
+    for f in fields(th):
+        row[f.name] = getattr(th, f.name)
+    return row
+
+
+def main () :
+
+    parser = argparse.ArgumentParser(
+        description="Compute cloud cover statistics for Sentinel-2 band-stack GeoTIFFs.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument("files", nargs="+", help="Band-stack GeoTIFF files (B02,B03,B04,B08).")
+    parser.add_argument("--output", help="Output CSV file", required=True)
+    parser.add_argument("--t-bright", type=float, default=Thresholds.t_bright, help="Brightness threshold.")
+    parser.add_argument("--t-ndvi", type=float, default=Thresholds.t_ndvi, help="NDVI threshold.")
+    parser.add_argument("--t-white", type=float, default=Thresholds.t_white, help="Whiteness threshold.")
+    parser.add_argument("--haze-blue", type=float, default=Thresholds.haze_blue, help="Haze blue-ratio threshold.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    args = parser.parse_args()
+
+    th = Thresholds(args.t_bright, args.t_ndvi, args.t_white, args.haze_blue)
+
+    fieldnames = ["file", "valid_px", "cloud_px", "cloud_fraction"] \
+        + [f.name for f in fields(Thresholds)]
+
+    # Each file is an independent CPU-bound job (decompression + kernel),
+    # so fan out across processes rather than threads. Rows are written to
+    # the CSV as they complete rather than collected in memory, so partial
+    # results survive an interrupted run.
+    # Split GDAL's decoder threads across the worker processes: every
+    # worker running with ALL_CPUS would spawn ~workers^2 threads and
+    # oversubscribe the machine. A single worker still gets them all.
+    workers = args.workers or 1
+    gdal_threads = "ALL_CPUS" if workers <= 1 else max(1, (os.cpu_count() or 1) // workers)
+
+    n_rows = 0
+    with open(args.output, "w", newline="") as fp:
+        fp.reconfigure(write_through=True)
+        w = csv.DictWriter(fp, fieldnames=fieldnames)
+        w.writeheader()
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            futs = {ex.submit(process_file, f, th, gdal_threads): f for f in args.files}
+            for fut in as_completed(futs):
+                print(f"processed {futs[fut]}")
+                r = fut.result()
+                if r :
+                    w.writerow(r)
+                    fp.flush()
+                    n_rows += 1
+
+    if n_rows == 0 :
+        print("No rows produced.")
+        sys.exit(1)
+    print(f"wrote {n_rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,22 @@
 # Joe Desbonnet 2024-02-03
 #
 from datetime import date, timedelta
+import aiohttp
+import asyncio
+import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
-import geopandas as gpd
-from shapely.geometry import shape
 import os
+import shutil
 import sys
 import signal
 import argparse
+import threading
+import time
+import zipfile
 
 
 #
@@ -21,10 +29,34 @@ import argparse
 #
 def signal_handler(sig, frame):
     sys.exit(0)
-signal.signal(signal.SIGINT, signal_handler)
 
 
-def get_keycloak(username: str, password: str) -> str:
+#
+# One session shared by the catalogue queries and Keycloak auth:
+# connection pooling / HTTP keep-alive (with TLS session resumption in
+# urllib3's pool) avoids paying a full TCP+TLS handshake per request, and
+# transient 429/5xx responses on GETs are retried with backoff instead of
+# failing the run.
+#
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=5, backoff_factor=1.0,
+                      status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET"]),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+
+# Static part of the OData catalogue query; only the variable criteria are
+# formatted per call.
+QUERY_URL_PREFIX = ("https://catalogue.dataspace.copernicus.eu/odata/v1/Products?"
+                    "$filter=Collection/Name eq 'SENTINEL-2' and contains(Name,'MSIL2A') eq true ")
+
+
+def get_keycloak(username: str, password: str) -> dict:
     data = {
         "client_id": "cdse-public",
         "username": username,
@@ -32,7 +64,7 @@ def get_keycloak(username: str, password: str) -> str:
         "grant_type": "password",
     }
     try:
-        r = requests.post(
+        r = SESSION.post(
             "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token",
             data=data,
         )
@@ -41,7 +73,41 @@ def get_keycloak(username: str, password: str) -> str:
         raise Exception(
             f"Keycloak token creation failed. Reponse from the server was: {r.json()}"
         )
-    return r.json()["access_token"]
+    return r.json()
+
+
+class TokenCache :
+    """
+    Caches the Keycloak access token and re-authenticates only when within
+    30s of the expiry reported by the identity server ('expires_in'), or
+    when a request comes back 401. Tokens are valid for ~10 minutes, so
+    this replaces one auth round trip per product with one per validity
+    window.
+    """
+
+    def __init__ (self, username, password) :
+        self.username = username
+        self.password = password
+        self.token = None
+        self.expires_at = 0.0
+        # get()/refresh() run on asyncio.to_thread workers; the lock keeps
+        # concurrent downloads from each issuing their own re-auth.
+        self.lock = threading.Lock()
+
+    def get (self) :
+        with self.lock:
+            if self.token is None or time.time() > self.expires_at - 30 :
+                self._refresh_locked()
+            return self.token
+
+    def refresh (self) :
+        with self.lock:
+            self._refresh_locked()
+
+    def _refresh_locked (self) :
+        response = get_keycloak(self.username, self.password)
+        self.token = response["access_token"]
+        self.expires_at = time.time() + float(response.get("expires_in", 600))
 
 
 def query_products (args) :
@@ -65,8 +131,11 @@ def query_products (args) :
         geographic_criteria += f"and OData.CSC.Intersects(area=geography'SRID=4326;{args.bounding_box}') " 
 
     if args.mgrs_tiles :
-        tiles = args.mgrs_tiles.split(",")
-        print (f"tiles={tiles}")
+        # The tile filter is applied server-side: rows for unwanted tiles
+        # never cross the network, so there is no client-side skip loop.
+        tiles = [t.strip() for t in args.mgrs_tiles.split(",") if t.strip()]
+        if args.debug :
+            print (f"tiles={tiles}")
         tile_sub_clauses = []
         for tile in tiles :
             #geographic_criteria += f"and Attributes/OData.CSC.StringAttribute/any(att:att/Name eq 'tileId' and att/OData.CSC.StringAttribute/Value eq '{tile}') "
@@ -81,48 +150,94 @@ def query_products (args) :
     # Older OData documentation: https://scihub.copernicus.eu/userguide/ODataAPI
     # List of Sentinel-2 query attributes: https://catalogue.dataspace.copernicus.eu/odata/v1/Attributes(SENTINEL-2)
     # TODO: can we work the MGRS tiles in this query?
-    query_url = (f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products?" 
-             f"$filter=Collection/Name eq 'SENTINEL-2' and contains(Name,'MSIL2A') eq true " 
+    query_url = (f"{QUERY_URL_PREFIX}"
              #f"and OData.CSC.Intersects(area=geography'SRID=4326;{args.bounding_box}') "
              f"{geographic_criteria}"
              f"and ContentDate/Start gt {args.begin_date}T00:00:00.000Z " 
              f"and ContentDate/Start lt {args.end_date}T00:00:00.000Z "
              f"and Attributes/OData.CSC.DoubleAttribute/any(att:att/Name eq 'cloudCover' and att/OData.CSC.DoubleAttribute/Value le {args.max_cloud})"
-             f"&$count=True&$top=1000" )
+             f"&$count=True&$top=1000"
+             # Only the fields downstream code actually reads; Checksum is
+             # needed for the post-download verification.
+             f"&$select=Id,Name,ContentLength,Checksum" )
 
     if args.debug == True :
         print (f"query_url={query_url}")
 
-    json_ = requests.get(query_url).json()
+    json_ = SESSION.get(query_url).json()
 
     if args.debug == True :
-        print (f"json={json_}")
-
-
-
-    p = pd.DataFrame.from_dict(json_["value"])
-    p["geometry"] = p["GeoFootprint"].apply(shape)
-    productDF = gpd.GeoDataFrame(p).set_geometry("geometry") # Convert PD to GPD
-    #productDF = productDF[~productDF["Name"].str.contains("L1C")] # Remove L1C dataset
+        # Formatting the full 1000-row payload as a string costs tens of MB;
+        # the row count is what's useful here.
+        print ("json size:", len(json_.get("value", [])))
+
+    # Follow @odata.nextLink pages so result sets beyond the server's
+    # 1000-row page size are no longer silently truncated.
+    rows = json_["value"]
+    while "@odata.nextLink" in json_ :
+        json_ = SESSION.get(json_["@odata.nextLink"]).json()
+        rows.extend(json_["value"])
+
+    # No geometry is used downstream, so stay with a plain DataFrame: no
+    # per-row shapely parsing and no GeoDataFrame conversion.
+    productDF = pd.DataFrame.from_dict(rows)
     print(f" total L2A tiles found {len(productDF)}")
     productDF["identifier"] = productDF["Name"].str.split(".").str[0]
-    allfeat = len(productDF)
 
-    #return pd.DataFrame.from_dict(json_["value"])
     return productDF
 
 
 
+def scan_existing (l2a_root) :
+    """
+    Map each tile directory under l2a_root to the set of file names it
+    holds, in one directory walk instead of a stat() per product.
+    """
+    existing = {}
+    if os.path.isdir(l2a_root) :
+        for entry in os.scandir(l2a_root):
+            if entry.is_dir() :
+                existing[entry.name] = {e.name for e in os.scandir(entry.path)}
+    return existing
+
+
+def validate_existing (l2a_root, existing) :
+    """
+    Re-run the zip CRC check over downloaded products that are newer than
+    the .zip_verified marker file, removing any that fail (they drop out of
+    the existing map, so the caller re-downloads them). Older files were
+    validated by a previous run and are trusted on the marker alone.
+    """
+    marker = f"{l2a_root}/.zip_verified"
+    verified_before = os.path.getmtime(marker) if os.path.exists(marker) else 0.0
+    for mgrs_tile, names in existing.items():
+        for name in list(names):
+            path = f"{l2a_root}/{mgrs_tile}/{name}"
+            if not name.endswith(".zip") or os.path.getmtime(path) <= verified_before :
+                continue
+            if zip_crc_check(path) is not None :
+                print(f"{path} failed zip CRC validation, removing")
+                os.remove(path)
+                names.discard(name)
+    with open(marker, "w"):
+        pass
+    os.utime(marker)
+
+
 def list_products (productDF, args) :
 
-    for index,feat in enumerate(productDF.iterfeatures()):
-        product_uuid = feat['properties']['Id']
-        product_name = feat['properties']['Name']
-        size_MiB = feat['properties']['ContentLength'] / (1024*1024)
+    existing = scan_existing(args.l2a_root)
+
+    for feat in productDF.to_dict("records"):
+        product_uuid = feat['Id']
+        product_name = feat['Name']
+        size_MiB = feat['ContentLength'] / (1024*1024)
         safe_file_path = get_safe_file_path(product_name,args)
+        mgrs_tile = os.path.basename(os.path.dirname(safe_file_path))
+        safe_file = os.path.basename(safe_file_path)
 
         downloaded_checkmark = "x"
-        if os.path.exists(safe_file_path) :
+        if safe_file in existing.get(mgrs_tile, ()) :
             downloaded_checkmark = "✔"
 
         print (f"{product_name} {size_MiB:5.0f} {downloaded_checkmark}")
@@ -137,59 +252,210 @@ def get_safe_file_path (product_name, args) :
 
     safe_parts = product_name.split('_')
     mgrs_tile = safe_parts[5]
-    safe_path = f"{args.l2a_root}/{mgrs_tile}/{safe_file}"
     return f"{args.l2a_root}/{mgrs_tile}/{safe_file}"
 
 
 
-def download_one_product (product_id, safe_download_path, safe_path, args) :
+class ChecksumMismatchError (Exception) :
+    pass
+
 
+def digest_file (path, algo) :
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, algo).hexdigest()
+
+
+def zip_crc_check (path) :
     """
-    
+    CRC-read every entry of the archive. Returns the first bad entry name,
+    the path itself if the file is not a zip at all, or None if it is good.
+    """
+    try:
+        with zipfile.ZipFile(path) as z:
+            return z.testzip()
+    except zipfile.BadZipFile:
+        return path
+
+
+def pick_checksum (checksums) :
+    """
+    Pick a usable entry from the OData Checksum list, preferring sha256.
+    Returns (hashlib algorithm name, expected hex value) or (None, None).
+    """
+    if not checksums :
+        return None, None
+    by_algo = {c.get("Algorithm", "").lower(): c.get("Value") for c in checksums}
+    for algo in ("sha256", "md5"):
+        if by_algo.get(algo) :
+            return algo, by_algo[algo]
+    return None, None
+
+
+async def download_range (session, headers, url, fd, start, end) :
+    """
+    Fetch bytes [start,end] of url and write them at the matching offset of
+    the already-open output file with positioned writes.
+    """
+    range_headers = dict(headers)
+    range_headers["Range"] = f"bytes={start}-{end}"
+    async with session.get(url, headers=range_headers) as r:
+        if r.status != 206 :
+            raise Exception(f"expected 206 partial content for range {start}-{end}, got {r.status}")
+        offset = start
+        async for chunk in r.content.iter_chunked(1024*1024):
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+
+
+async def download_chunked (session, headers, url, safe_download_path, args) :
+    """
+    Download url as args.range_chunks concurrent HTTP Range requests, each
+    streaming into its own offset of a pre-allocated file. A single stream
+    is throttled per-connection by the server, so several ranges in flight
+    raise aggregate throughput; the result is verified against
+    Content-Length before being trusted. Raises (and removes the partial
+    file) if the server does not serve byte ranges.
+    """
+    head = await session.head(url, headers=headers, allow_redirects=True)
+    head.close()
+    content_length = int(head.headers.get("Content-Length", 0))
+    if content_length == 0 or head.headers.get("Accept-Ranges") != "bytes" :
+        raise Exception("server does not advertise byte-range support")
+
+    fd = os.open(safe_download_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        os.posix_fallocate(fd, 0, content_length)
+        chunk_size = -(-content_length // args.range_chunks)  # ceil division
+        async with asyncio.TaskGroup() as tg:
+            for start in range(0, content_length, chunk_size):
+                end = min(start + chunk_size, content_length) - 1
+                tg.create_task(download_range(session, headers, url, fd, start, end))
+        os.fsync(fd)
+    except Exception:
+        os.close(fd)
+        os.remove(safe_download_path)
+        raise
+    os.close(fd)
+
+    if os.path.getsize(safe_download_path) != content_length :
+        os.remove(safe_download_path)
+        raise Exception("chunked download size does not match Content-Length")
+
+
+async def download_one_product (session, sem, token_cache, product_id, safe_download_path, safe_path, args, checksums=None) :
+
+    """
+
+    session (aiohttp.ClientSession) : shared session; connections are pooled across all downloads.
+
+    sem (asyncio.Semaphore) : limits the number of products in flight to args.parallel.
+
+    token_cache (TokenCache) : supplies the current access token, refreshed on expiry or 401.
+
     product_id (string) : Product ID. Example 'S2A_MSIL2A_20241105T105231_N0511_R051_T31UGS_20241105T150152'
-    
+
     safe_download_path (string) : A temporary file path into which to start the download. When complete it will be moved to safe_path.
-    
+
     safe_path (string) : The final destination of the fully downloaded product file.
+
+    checksums (list) : OData Checksum entries for the product; when present the
+    download is verified against the matching digest before the rename.
     """
-    
+
     try:
-        session = requests.Session()
-        keycloak_token = get_keycloak(args.username,args.password)
-                
-        session.headers.update({"Authorization": f"Bearer {keycloak_token}"})
+      async with sem:
         url = f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products({product_id})/$value"
-                
+
         print(f"getting {url}")
-        response = session.get(url, allow_redirects=False)
-                
-        print(f"response={response}")
-                
-        # Unclear what this is about
-        # 301: moved permanently
-        while response.status_code in (301, 302, 303, 307):
-            url = response.headers["Location"]
-            # This takes a while
-            response = session.get(url, allow_redirects=False)
-            print (f" ** response={response}")
-                    
-
-            print(f"getting {url}")
-            file = session.get(url, verify=False, allow_redirects=True)
-            with open(safe_download_path, "wb") as p:
-                print(f"{product_id} writing to {safe_download_path}")
-                p.write(file.content)
-
-                # Check if good SAFE.zip file, use file length for the moment.
-                safe_file_size = os.path.getsize(safe_download_path)
-                if safe_file_size > 100000 :
-                    print(f"{product_id} renaming from {safe_download_path} to {safe_path}")
-                    # Now that we've got a good product downloaded, rename to final filename
-                    os.rename(safe_download_path, safe_path)
-                    print(f"{product_id} has been downloaded")
-                else :
-                    print(f"{safe_download_path} too small to be a valid SAFE.zip size={safe_file_size}")
-                    
+        # The token refresh is a blocking requests POST to Keycloak; run it
+        # on a worker thread like the other blocking work in this coroutine.
+        for attempt in range(2):
+            auth_headers = {"Authorization": f"Bearer {await asyncio.to_thread(token_cache.get)}"}
+            response = await session.get(url, headers=auth_headers, allow_redirects=False)
+            response.close()
+            if response.status == 401 and attempt == 0 :
+                # Stale token: refresh once and retry
+                await asyncio.to_thread(token_cache.refresh)
+                continue
+            break
+
+        print(f"response={response.status}")
+
+        # Let the session follow any remaining redirect chain natively and
+        # keep the final URL; the download below then runs exactly once
+        # against it instead of once per hop.
+        if response.status in (301, 302, 303, 307):
+            response = await session.get(response.headers["Location"], headers=auth_headers)
+            response.close()
+            url = str(response.url)
+            print (f" ** resolved to {url}")
+
+        # Stream the body straight to disk in 1 MiB copies rather than
+        # buffering the whole SAFE.zip (often ~1 GB) in memory first.
+        print(f"{product_id} writing to {safe_download_path}")
+        algo, expected = pick_checksum(checksums)
+        digest = None
+        try:
+            await download_chunked(session, auth_headers, url, safe_download_path, args)
+        except Exception as chunk_err:
+            print(f"{product_id} range download failed ({chunk_err}), falling back to single stream")
+            # Resume a partial file from an earlier interrupted run if the
+            # server honours the Range request (206), else restart.
+            resume_from = os.path.getsize(safe_download_path) if os.path.exists(safe_download_path) else 0
+            stream_headers = dict(auth_headers)
+            if resume_from > 0 :
+                stream_headers["Range"] = f"bytes={resume_from}-"
+            async with session.get(url, headers=stream_headers) as file:
+                file.raise_for_status()
+                if resume_from > 0 and file.status != 206 :
+                    resume_from = 0
+                # Hash the stream while it is in RAM anyway; negligible CPU
+                # next to the network wait, and saves re-reading the file.
+                h = hashlib.new(algo) if (expected and resume_from == 0) else None
+                with open(safe_download_path, "ab" if resume_from > 0 else "wb") as p:
+                    async for chunk in file.content.iter_chunked(1024*1024):
+                        p.write(chunk)
+                        if h is not None :
+                            h.update(chunk)
+                    # Push the bytes to disk before the rename below makes
+                    # the file look complete to later runs.
+                    p.flush()
+                    os.fsync(p.fileno())
+                if h is not None :
+                    digest = h.hexdigest()
+
+        if expected :
+            if digest is None :
+                # Chunked or resumed download: digest the assembled file on
+                # a worker thread; re-reading ~1 GB synchronously would
+                # freeze every other download in flight.
+                digest = await asyncio.to_thread(digest_file, safe_download_path, algo)
+            if digest.lower() != expected.lower() :
+                os.remove(safe_download_path)
+                raise ChecksumMismatchError(
+                    f"{product_id} {algo} mismatch: got {digest}, expected {expected}")
+
+        # Check if good SAFE.zip file, use file length for the moment.
+        safe_file_size = os.path.getsize(safe_download_path)
+        if safe_file_size > 100000 :
+            # CRC-check every archive entry before the file becomes visible
+            # under its final name: a truncated or corrupt zip would
+            # otherwise be skipped as "already downloaded" forever after.
+            # The CRC read touches the whole archive, so it too runs on a
+            # worker thread rather than blocking the event loop.
+            bad = await asyncio.to_thread(zip_crc_check, safe_download_path)
+            if bad is not None :
+                os.remove(safe_download_path)
+                raise Exception(f"{product_id} zip CRC validation failed ({bad}); partial removed")
+            print(f"{product_id} renaming from {safe_download_path} to {safe_path}")
+            # Now that we've got a good product downloaded, rename to final
+            # filename. os.replace is atomic and overwrites an existing
+            # target on every platform, unlike os.rename.
+            os.replace(safe_download_path, safe_path)
+            print(f"{product_id} has been downloaded")
+        else :
+            print(f"{safe_download_path} too small to be a valid SAFE.zip size={safe_file_size}")
+
     except Exception as e:
                 print(f"problem with server: {e}")
 
@@ -198,7 +464,7 @@ def download_one_product (product_id, safe_download_path, safe_path, args) :
 
 
 #
-def download_products (productDF,args) :
+async def download_products (productDF,args) :
 
     #p["geometry"] = p["GeoFootprint"].apply(shape)
     #productDF = gpd.GeoDataFrame(p).set_geometry("geometry") # Convert PD to GPD
@@ -212,60 +478,62 @@ def download_products (productDF,args) :
     if allfeat == 0:
         print("No tiles found.")
     else:
-        ## download all tiles from server
-        for index,feat in enumerate(productDF.iterfeatures()):
-        
-        
-            # Show all properties
-            #for propertyName in feat['properties'] :
-            #    print (f"property[{propertyName}]={feat['properties'][propertyName]}")
-
-            #print(f"feat={feat}")
-            
-            #for f in feat:
-            #    for propertyName in feat[f] :
-            #        print (f"property[{f}][{propertyName}]={feat[f][propertyName]}")
-        
-            product_uuid = feat['properties']['Id']
-
-            # Product name sometimes ends in .SAFE and sometimes not (!?)
-            product_name = feat['properties']['Name']
-            if product_name.endswith(".SAFE") :
-                safe_file = f"{product_name}.zip"
-            else :
-                safe_file = f"{product_name}.SAFE.zip"
-
-            print(f"SAFE_FILE={safe_file}")
-
-            safe_parts = product_name.split('_')
-            mgrs_tile = safe_parts[5]
-            
-            #if not mgrs_tile in tiles_of_interest :
-            #    print (f"only interested in {tiles_of_interest}, skipping {mgrs_tile}")
-            #    continue
-            	
-            # If directory for the tile does not exist, create it 
-            mgrs_tile_path = f"{args.l2a_root}/{mgrs_tile}"
-            if not os.path.exists(mgrs_tile_path) :
-                print(f"mkdir {mgrs_tile_path}")
-                os.mkdir(mgrs_tile_path)
-
-            # If the product is already downloaded, skip (TODO: check for valid ZIP) 
-            safe_path = f"{args.l2a_root}/{mgrs_tile}/{safe_file}"
-            safe_download_path = f"{args.l2a_root}/{mgrs_tile}/_downloading_{safe_file}"
-            if os.path.exists(safe_path) :
-                print (f"Product {safe_path} already downloaded")
-                continue
-            
-            
-            print(f"Downloading mgrs_tile={mgrs_tile} product_name={product_name} product_id={product_uuid} into {safe_path}")
-                
-            download_one_product(feat['properties']['Id'],safe_download_path,safe_path,args)
+        # One cached token for the whole batch, refreshed only near expiry
+        token_cache = TokenCache(args.username, args.password)
+
+        # Vectorize the per-product name parsing and path construction.
+        # Product name sometimes ends in .SAFE and sometimes not (!?)
+        productDF = productDF.copy()
+        productDF["mgrs_tile"] = productDF["Name"].str.split("_", n=6, expand=True)[5]
+        productDF["safe_file"] = np.where(productDF["Name"].str.endswith(".SAFE"),
+                                          productDF["Name"] + ".zip",
+                                          productDF["Name"] + ".SAFE.zip")
+        productDF["safe_path"] = args.l2a_root + "/" + productDF["mgrs_tile"] + "/" + productDF["safe_file"]
+
+        # Group the work by tile so concurrent writers stay within one
+        # output directory at a time, and start the largest products first
+        # so short downloads fill the tail slots of the pool (LPT
+        # scheduling) instead of a big file running alone at the end.
+        productDF = productDF.sort_values(["mgrs_tile", "ContentLength"],
+                                          ascending=[True, False])
+
+        # One mkdir per distinct tile rather than a stat per product
+        for mgrs_tile in productDF["mgrs_tile"].unique():
+            os.makedirs(f"{args.l2a_root}/{mgrs_tile}", exist_ok=True)
+
+        # One scandir pass over the tile directories replaces the per-product
+        # os.path.exists
+        existing = scan_existing(args.l2a_root)
+        validate_existing(args.l2a_root, existing)
+
+        # Each download is an I/O-bound HTTP GET, so run them as asyncio
+        # tasks on one shared session; the semaphore keeps args.parallel
+        # products in flight and the connector caps the connection count.
+        sem = asyncio.Semaphore(args.parallel)
+        connector = aiohttp.TCPConnector(limit=max(16, args.parallel))
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async with asyncio.TaskGroup() as tg:
+
+                ## download all tiles from server
+                for feat in productDF.itertuples(index=False):
+
+                    # If the product is already downloaded, skip (TODO: check for valid ZIP)
+                    safe_path = feat.safe_path
+                    safe_download_path = f"{args.l2a_root}/{feat.mgrs_tile}/_downloading_{feat.safe_file}"
+                    if feat.safe_file in existing.get(feat.mgrs_tile, ()) :
+                        print (f"Product {safe_path} already downloaded")
+                        continue
+
+                    print(f"Downloading mgrs_tile={feat.mgrs_tile} product_name={feat.Name} product_id={feat.Id} into {safe_path}")
+
+                    tg.create_task(download_one_product(session,sem,token_cache,feat.Id,safe_download_path,safe_path,args,getattr(feat,'Checksum',None)))
 
 
 
 if __name__ == "__main__":
 
+    signal.signal(signal.SIGINT, signal_handler)
+
     parser = argparse.ArgumentParser(description="Download Sentinel-2 L2A products.")
 
     parser.add_argument("--begin-date",help="The begin date (yyyy-MM-dd) for the search.", required=True)
@@ -277,8 +545,10 @@ if __name__ == "__main__":
     parser.add_argument("--l2a-root",  help="The root of the L2A directory into which to write the L2A SAFE.zip files.", required=True)
     parser.add_argument("--username",  help="Dataspace username / email address.")
     parser.add_argument("--password",  help="Password associated with username.")
+    parser.add_argument("--parallel",  type=int, default=4, help="Number of product downloads to run concurrently.")
+    parser.add_argument("--range-chunks", type=int, default=4, help="Number of concurrent HTTP Range requests used per product download.")
     parser.add_argument("--query-only", action="store_true", help="Only issue the product query and determine which products require downloading. No product downloads will take place.")
-    parser.add_argument("--debug", action="store_false", help="Output debugging information.")
+    parser.add_argument("--debug", action="store_true", default=False, help="Output debugging information.")
     args = parser.parse_args()
 
     products = query_products (args) 
@@ -291,6 +561,6 @@ if __name__ == "__main__":
     if args.query_only == True :
         list_products (products, args)
     else :
-        download_products (products, args)
+        asyncio.run(download_products (products, args))
 
 
@@ -1,30 +1,39 @@
 import argparse
-import cdsapi
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 
-def download_era5_data(output_file, parameters, bbox, date_range):
-    """
-    Download ERA-5 reanalysis data from Copernicus Climate Data Store.
+import cdsapi
 
-    Requires ~/.cdsapirc file for API authentication. 
 
-    Require cdsapi with version > 0.7.2 (Ubuntu 22.04 repo has version which 
-    is too old, so don't use apt get. Instead pip3 install 'cdsapi>=0.7.2'.)
-    Also this was required: pip3 install --upgrade attrs
-
-    Args:
-        output_file (str): Path to save the output NetCDF file.
-        parameters (list): List of parameters (variable names) to download.
-        bbox (list): Bounding box [North, West, South, East] (degrees).
-        start_date (str): Start date in 'YYYY-MM-DD' format.
-        end_date (str): End date in 'YYYY-MM-DD' format.
+def month_slices (start_date, end_date) :
+    """
+    Split a start/end date pair (yyyy-MM-dd) into per-calendar-month
+    'start/end' date ranges.
     """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    slices = []
+    s = start
+    while s <= end:
+        if s.month == 12 :
+            month_end = date(s.year, 12, 31)
+        else :
+            month_end = date(s.year, s.month + 1, 1) - timedelta(days=1)
+        e = min(month_end, end)
+        slices.append(f"{s}/{e}")
+        s = e + timedelta(days=1)
+    return slices
+
+
+def download_one_slice (output_file, parameters, bbox, date_range) :
+    # Each job gets its own cdsapi.Client: the client holds per-request
+    # session state and is not safe to share between threads.
     c = cdsapi.Client()
 
-
     dataset = 'reanalysis-era5-single-levels'
     #dataset = 'reanalysis-era5-single-levels-monthly-means'
-    hours = [f"{hour:02d}:00" for hour in range(24)]
-    print (f"hours={hours}")
     c.retrieve(
         dataset,
         {
@@ -36,13 +45,62 @@ def download_era5_data(output_file, parameters, bbox, date_range):
             'format': 'grib',
 
             'area': bbox,  # North, West, South, East
-            #'date': f"{start_date}/{end_date}",
-            #'date': f"{start_date}",
             'date': date_range,
             'time': [f"{hour:02d}:00" for hour in range(24)],  # All hours of the day
         },
         output_file
     )
+
+
+def download_era5_data(output_file, parameters, bbox, date_range, max_workers=4):
+    """
+    Download ERA-5 reanalysis data from Copernicus Climate Data Store.
+
+    Requires ~/.cdsapirc file for API authentication.
+
+    Require cdsapi with version > 0.7.2 (Ubuntu 22.04 repo has version which
+    is too old, so don't use apt get. Instead pip3 install 'cdsapi>=0.7.2'.)
+    Also this was required: pip3 install --upgrade attrs
+
+    Multi-month ranges are split into one CDS job per calendar month and
+    submitted from a thread pool: most of the wait is server-side queueing,
+    and CDS queues several jobs per user, so wall time approaches the
+    slowest job rather than the sum. GRIB messages are independently
+    framed, so the finished parts are simply byte-concatenated.
+
+    Args:
+        output_file (str): Path to save the output GRIB file.
+        parameters (list): List of parameters (variable names) to download.
+        bbox (list): Bounding box [North, West, South, East] (degrees).
+        date_range (str): Date or 'start/end' range in 'YYYY-MM-DD' format.
+        max_workers (int): Number of concurrent CDS jobs.
+    """
+    if "/" in date_range :
+        start_date, end_date = date_range.split("/")
+        slices = month_slices(start_date, end_date)
+    else :
+        slices = [date_range]
+
+    print (f"date slices={slices}")
+
+    if len(slices) == 1 :
+        download_one_slice(output_file, parameters, bbox, slices[0])
+        print(f"Data successfully downloaded to {output_file}")
+        return
+
+    part_files = [f"{output_file}.{i}.grib" for i in range(len(slices))]
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = [ex.submit(download_one_slice, part_file, parameters, bbox, date_slice)
+                   for part_file, date_slice in zip(part_files, slices)]
+        for f in futures:
+            f.result()
+
+    with open(output_file, "wb") as out:
+        for part_file in part_files:
+            with open(part_file, "rb") as p:
+                shutil.copyfileobj(p, out)
+            os.remove(part_file)
+
     print(f"Data successfully downloaded to {output_file}")
 
 
@@ -59,6 +117,7 @@ if __name__ == "__main__":
     parser.add_argument("--end-date", help="End date in yyyy-MM-dd format, example 2024-11-21", required=False)
     parser.add_argument("--variable", help="One of 2m_temperature, total_precipitation...", default="2m_temperature", required=True)
     parser.add_argument("--output", help="Output file", required=True)
+    parser.add_argument("--parallel", type=int, default=4, help="Number of CDS retrieve jobs to run concurrently.")
     args = parser.parse_args()
 
     #parameters = ["2m_temperature", "total_precipitation"]
@@ -76,5 +135,4 @@ if __name__ == "__main__":
     variables = args.variable.split(",")
     print (f"variables={variables}")
 
-    download_era5_data(args.output, variables, bbox, date_range)
-
+    download_era5_data(args.output, variables, bbox, date_range, max_workers=args.parallel)
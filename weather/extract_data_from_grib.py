@@ -1,45 +1,58 @@
 import argparse
 import xarray as xr
 import numpy as np
-import pandas as pd
 
 
-def extract_data_from_grib (grib_file, variable_name, target_lat, target_lon, output_file) :
-
-    ds = xr.open_dataset(grib_file, engine='cfgrib')
-
-    # Adjust longitude if necessary
-    if target_lon < 0:
-        target_lon += 360
-
-    # Select data at the specified point for all times
-    data_at_point = ds[variable_name].sel(
-        latitude=target_lat,
-        longitude=target_lon,
+def extract_data_from_grib (grib_file, variable_name, lats, lons, output_file) :
+    """
+    Extract variable_name at one or more (lat,lon) points for all times.
+
+    All points are selected in one vectorized .sel with array indexers, so
+    the GRIB file is opened (and its cfgrib index built) once rather than
+    per point.
+    """
+    # A fixed indexpath persists the cfgrib index sidecar next to the GRIB
+    # file, so the (potentially minutes-long) index build is paid once
+    # rather than on every run; chunks={} defers the array reads until
+    # .sel has picked the target grid cells.
+    ds = xr.open_dataset(grib_file, engine='cfgrib',
+                         backend_kwargs={'indexpath': grib_file + '.idx'},
+                         chunks={})
+
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+
+    # Adjust longitudes if necessary
+    lons = np.where(lons < 0, lons + 360, lons)
+
+    # Select data at the specified points for all times: shape (time, pt)
+    data_at_points = ds[variable_name].sel(
+        latitude=xr.DataArray(lats, dims='pt'),
+        longitude=xr.DataArray(lons, dims='pt'),
         method='nearest'
     )
 
-    # Extract time and temperature data
-    times = data_at_point['time'].values
-    temperatures = data_at_point.values
-
-    # Convert times to pandas datetime
-    times = pd.to_datetime(times)
-
-    # Convert to Unix epoch time (seconds since 1970-01-01)
-    epoch_times = times.astype(np.int64) // 1e9  # nanoseconds to seconds
-
-    # Create a DataFrame
-    df = pd.DataFrame({
-        'time': epoch_times,
-        'temperature': temperatures
-    })
+    # Unix epoch time (seconds since 1970-01-01) straight from the
+    # datetime64 values; no pandas round trip.
+    epoch_times = data_at_points['time'].values.astype('datetime64[s]').astype(np.int64)
+    temperatures = np.asarray(data_at_points.values, dtype=np.float32)
+    if temperatures.ndim == 1 :
+        temperatures = temperatures[:, np.newaxis]
 
     # Optional: Convert temperature from Kelvin to Celsius
-    #df['temperature'] = df['temperature'] - 273.15
+    #temperatures = temperatures - 273.15
 
-    # Save to a CSV file
-    df.to_csv(output_file, sep=' ', index=False)
+    # Numeric columns only: np.savetxt writes the preformatted array much
+    # faster than building a DataFrame just for to_csv
+    n_points = temperatures.shape[1]
+    if n_points == 1 :
+        names = ["temperature"]
+    else :
+        names = [f"temperature{k}" for k in range(n_points)]
+    np.savetxt(output_file,
+               np.column_stack([epoch_times, temperatures]),
+               fmt="%d" + " %.6f" * n_points,
+               header="time " + " ".join(names), comments="")
 
 
 
@@ -53,10 +66,15 @@ if __name__ == "__main__":
     )
 
     parser.add_argument("grib_file", help="GRIB file")
-    parser.add_argument("--latitude", help="Latitude of location, eg 53.3", required=True)
-    parser.add_argument("--longitude", help="Longitude of location, eg -8.5", required=True)
+    parser.add_argument("--latitude", help="Latitude(s) of location, comma separated, eg 53.3 or 53.3,52.7", required=True)
+    parser.add_argument("--longitude", help="Longitude(s) of location, comma separated, eg -8.5 or -8.5,-9.0", required=True)
     parser.add_argument("--variable", help="One of t2m,tp,...", default="t2m")
     parser.add_argument("--output", help="Output file", required=True)
     args = parser.parse_args()
 
-    extract_data_from_grib (args.grib_file, args.variable, float(args.latitude), float(args.longitude), args.output)
+    lats = [float(v) for v in args.latitude.split(",")]
+    lons = [float(v) for v in args.longitude.split(",")]
+    if len(lats) != len(lons) :
+        parser.error("--latitude and --longitude must list the same number of points")
+
+    extract_data_from_grib (args.grib_file, args.variable, lats, lons, args.output)